@@ -0,0 +1,42 @@
+"""
+Compare the legacy Fernet/base64 storage format with the binary analysis envelope.
+
+Usage: python benchmark_envelope.py [iterations]
+"""
+import json
+import sys
+import time
+
+from security import encrypt_data, decrypt_data, seal_analysis, open_analysis
+from services.analyzer import analyze_manual_data
+
+
+def _time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6  # microseconds
+
+
+def main(iterations=5000):
+    analysis = analyze_manual_data({"revenue": 1250000, "expenses": 850000, "profit": 400000})
+
+    raw_json = json.dumps(analysis)
+    legacy = encrypt_data(raw_json)
+    envelope = seal_analysis(analysis)
+
+    legacy_us = _time_per_call(lambda: json.loads(decrypt_data(legacy)), iterations)
+    envelope_us = _time_per_call(lambda: open_analysis(envelope), iterations)
+
+    legacy_size = len(legacy.encode())
+    envelope_size = len(envelope)
+
+    print(f"Plain JSON:           {len(raw_json):>6} bytes")
+    print(f"Legacy (Fernet/b64):  {legacy_size:>6} bytes   decrypt {legacy_us:8.1f} us")
+    print(f"Envelope (v1):        {envelope_size:>6} bytes   decrypt {envelope_us:8.1f} us")
+    print(f"Storage saved:        {(1 - envelope_size / legacy_size) * 100:5.1f}%")
+    print(f"Decrypt time saved:   {(1 - envelope_us / legacy_us) * 100:5.1f}%")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
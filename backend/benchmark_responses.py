@@ -0,0 +1,53 @@
+"""
+Compare FastAPI's default return path (jsonable_encoder, then ORJSONResponse)
+with returning ORJSONResponse directly, for the history list and an upload result.
+
+Usage: python benchmark_responses.py [history_records] [iterations]
+"""
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+from services.analyzer import analyze_manual_data
+
+
+def _time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e3  # milliseconds
+
+
+def _compare(label, payload, iterations):
+    encoded_ms = _time_per_call(lambda: ORJSONResponse(jsonable_encoder(payload)), iterations)
+    direct_ms = _time_per_call(lambda: ORJSONResponse(payload), iterations)
+    size = len(ORJSONResponse(payload).body)
+    print(f"{label:<22} {size:>9} bytes   encoder+orjson {encoded_ms:8.3f} ms   orjson only {direct_ms:8.3f} ms   "
+          f"saved {(1 - direct_ms / encoded_ms) * 100:5.1f}%")
+
+
+def main(history_records=500, iterations=50):
+    analysis = analyze_manual_data({"revenue": 1250000, "expenses": 850000, "profit": 400000})
+    summary = analysis["financial_summary"]
+    history = [
+        {
+            "id": i,
+            "date": "2024-01-01",
+            "filename": f"ledger_{i}.csv",
+            "revenue": 1250000.0 + i,
+            "profit": 400000.0,
+            "type": "PDF/CSV",
+            "recommendations": summary["recommendations"],
+            "tax_compliance": summary["tax_compliance"],
+        }
+        for i in range(history_records)
+    ]
+
+    _compare(f"History ({history_records})", history, iterations)
+    _compare("Upload result", analysis, iterations * 20)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -1,5 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 import os
 
@@ -8,7 +10,8 @@ load_dotenv()
 app = FastAPI(
     title="Financial Health Assessment API",
     description="Backend for SME Financial Health Assessment Tool",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse # routes with large payloads return ORJSONResponse directly to skip jsonable_encoder
 )
 
 # CORS Configuration
@@ -26,6 +29,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses above ~1KB (analysis payloads and history lists are mostly repetitive JSON)
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
 @app.get("/")
 async def root():
     return {"message": "Financial Health Assessment API is running"}
@@ -36,12 +43,26 @@ async def health_check():
 
 # Include Routers
 # Include Routers
-from routers import upload, auth, reports
-from database import engine, Base
+from routers import upload, auth, reports, analysis
+from database import engine, Base, SessionLocal
+
+from services.reencrypt import ensure_envelope_columns, start_background_reencryption
+from services.benchmark import ensure_margin_sketch
 
 # Create Database Tables
 Base.metadata.create_all(bind=engine)
+ensure_envelope_columns(engine)
+
+with SessionLocal() as db:
+    ensure_margin_sketch(db)
+
+@app.on_event("startup")
+def reencrypt_legacy_records():
+    # Re-encrypt old Fernet rows (and rows sealed with retired keys) in the background
+    if os.getenv("REENCRYPT_ON_STARTUP", "true").lower() != "false":
+        start_background_reencryption()
 
 app.include_router(upload.router)
 app.include_router(auth.router)
 app.include_router(reports.router)
+app.include_router(analysis.router)
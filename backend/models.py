@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -28,6 +28,28 @@ class FinancialRecord(Base):
     
     # Store full analysis result as a JSON string (for now) or text
     # In a real Postgres DB, use JSONB type
-    analysis_data = Column(String) 
+    analysis_data = Column(String) # Legacy: Fernet token, emptied once re-encrypted
+
+    # Compressed + encrypted binary envelope (see security.seal_analysis)
+    analysis_blob = Column(LargeBinary)
+    analysis_key_id = Column(Integer, index=True)
 
     owner = relationship("User", back_populates="financial_records")
+
+class BenchmarkSketch(Base):
+    __tablename__ = "benchmark_sketches"
+
+    # Serialized quantile sketch shared by all workers (see services/benchmark.py)
+    name = Column(String, primary_key=True)
+    data = Column(String)
+    count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class LedgerState(Base):
+    __tablename__ = "ledger_states"
+
+    # Per-period aggregates + watermark for append-mode uploads (see services/ledger.py)
+    record_id = Column(Integer, ForeignKey("financial_records.id"), primary_key=True)
+    state_blob = Column(LargeBinary) # Encrypted envelope, same format as analysis_blob
+    key_id = Column(Integer, index=True) # Re-sealed by services/reencrypt.py after key rotation
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
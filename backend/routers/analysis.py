@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from dependencies import get_current_user
+from models import User
+from services.scenarios import simulate_scenarios, ScenarioError
+
+router = APIRouter(
+    prefix="/analysis",
+    tags=["analysis"]
+)
+
+class ScenarioBase(BaseModel):
+    revenue: float
+    expenses: float
+    profit: Optional[float] = None
+    expense_breakdown: Optional[Dict[str, float]] = None
+    # Per-period revenue from the stored analysis (financial_summary.revenue.history)
+    revenue_history: Optional[List[float]] = None
+
+class ScenarioRequest(BaseModel):
+    base: ScenarioBase
+    # Driver -> list of percent changes, e.g. {"revenue": [-10, 0], "Rent": [0, 20]}
+    grid: Dict[str, List[float]] = Field(default_factory=dict)
+
+@router.post("/scenarios", summary="Simulate What-If Scenarios")
+def run_scenarios(
+    request: ScenarioRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Evaluate every combination of adjustments in the grid against the base figures.
+    Returns health score, risk level, GST net payable and forecast per scenario.
+    Nothing is saved to the user's history.
+    """
+    base = request.base
+    try:
+        scenarios = simulate_scenarios(
+            revenue=base.revenue,
+            expenses=base.expenses,
+            profit=base.profit,
+            breakdown=base.expense_breakdown,
+            revenue_history=base.revenue_history,
+            grid=request.grid,
+        )
+    except ScenarioError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "status": "success",
+        "count": len(scenarios),
+        "scenarios": scenarios
+    }
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from database import get_db
 from models import User, FinancialRecord
 from dependencies import get_current_user
 from services.report_generator import generate_pdf_report
-import json
+from security import load_analysis, DecryptionError
+from services.exporter import EXPORT_FORMATS, stream_csv, stream_ndjson, stream_parquet
 
 router = APIRouter(
     prefix="/reports",
@@ -26,19 +28,12 @@ async def download_report(
     if not record:
         raise HTTPException(status_code=404, detail="No financial data found. Please upload a file first.")
     
-    # Parse stored JSON
     # Parse stored JSON (Decrypt first)
     try:
-        from security import decrypt_data
-        decrypted_json = decrypt_data(record.analysis_data)
-        analysis_data = json.loads(decrypted_json)
-    except Exception as e:
+        analysis_data = load_analysis(record)
+    except DecryptionError as e:
         print(f"Error decrypting report data: {e}")
-        # Fallback if unencrypted (for old records) or error
-        try:
-             analysis_data = json.loads(record.analysis_data)
-        except:
-             analysis_data = {}
+        analysis_data = {}
 
     pdf_buffer = generate_pdf_report(current_user.full_name, analysis_data)
     
@@ -50,31 +45,53 @@ async def download_report(
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
+def _history_etag(user_id: int, db: Session):
+    """
+    Build a weak ETag from the user's record count, newest id and latest upload_date.
+    Uploads add a record (count and max id change), deletions lower the count,
+    and appends rewrite a record in place while stamping a new upload_date.
+    """
+    count, latest_id, latest_upload = db.query(
+        func.count(FinancialRecord.id),
+        func.max(FinancialRecord.id),
+        func.max(FinancialRecord.upload_date),
+    ).filter(FinancialRecord.user_id == user_id).one()
+    if not count:
+        return f'W/"history-{user_id}-empty"'
+    stamp = latest_upload.strftime("%Y%m%d%H%M%S%f") if latest_upload else "0"
+    return f'W/"history-{user_id}-{count}-{latest_id}-{stamp}"'
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: gzip re-encoding must not break revalidation
+    return "*" in candidates or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in candidates]
+
 @router.get("/history", summary="Get Analysis History")
 def get_analysis_history(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get a list of all past financial analyses for history tracking.
+    Returns 304 Not Modified when the client's ETag is still current.
     """
+    etag = _history_etag(current_user.id, db)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+
     records = db.query(FinancialRecord).filter(FinancialRecord.user_id == current_user.id).order_by(FinancialRecord.upload_date.desc()).all()
     
     history = []
-    from security import decrypt_data
-    
+
     for r in records:
-        analysis = {}
         try:
-            # Decrypt and parse analysis data if available
-            if r.analysis_data:
-                try:
-                    decrypted = decrypt_data(r.analysis_data)
-                    analysis = json.loads(decrypted)
-                except:
-                    # Fallback for unencrypted data
-                    analysis = json.loads(r.analysis_data)
-        except Exception as e:
+            analysis = load_analysis(r)
+        except DecryptionError as e:
             print(f"History parse error: {e}")
             analysis = {}
 
@@ -88,5 +105,39 @@ def get_analysis_history(
             "recommendations": analysis.get("recommendations", []),
             "tax_compliance": analysis.get("tax_compliance", None)
         })
-    
-    return history
+
+    # Returned directly so the (large) list skips jsonable_encoder and goes straight to orjson
+    return ORJSONResponse(history, headers=cache_headers)
+
+@router.get("/export", summary="Bulk Export Analysis History")
+def export_analysis_history(
+    format: str = Query("csv", description="csv, ndjson or parquet"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the user's full analysis history as CSV, NDJSON or Parquet.
+    Records are read from a server-side cursor and decrypted in batches,
+    so large histories never have to be built in memory.
+    """
+    format = format.lower()
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+
+    if format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+        body = stream_parquet(current_user.id)
+    elif format == "ndjson":
+        body = stream_ndjson(current_user.id)
+    else:
+        body = stream_csv(current_user.id)
+
+    filename = f"FinHealth_History_{current_user.id}.{format}"
+
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
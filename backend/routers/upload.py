@@ -1,12 +1,15 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from services.analyzer import process_financial_document, analyze_manual_data
+from services.analyzer import analyze_manual_data
+from services.ledger import ingest_ledger, load_ledger_state, save_ledger_state
 from dependencies import get_current_user
 from database import get_db
 from models import User, FinancialRecord
-import json
-from security import encrypt_data
+from security import seal_analysis, ACTIVE_KEY_ID
+from services.benchmark import apply_margin_benchmark, record_margin
+import datetime
 
 router = APIRouter(
     prefix="/upload",
@@ -31,17 +34,15 @@ async def upload_file(
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
     
-    result = await process_financial_document(file)
+    content = await file.read()
+    result, ledger_state = ingest_ledger(file.filename, content)
     
-    # Save to DB
-    # Save to DB
-
     # Save to DB
     summary = result.get("financial_summary", {})
+    apply_margin_benchmark(summary, db)
     
     # Encrypt the full analysis blob
-    json_data = json.dumps(result)
-    encrypted_blob = encrypt_data(json_data)
+    encrypted_blob = seal_analysis(result)
 
     record = FinancialRecord(
         user_id=current_user.id,
@@ -49,13 +50,61 @@ async def upload_file(
         revenue=summary.get("revenue", {}).get("total", 0),
         expenses=summary.get("expenses", {}).get("total", 0),
         profit=summary.get("net_profit", 0),
-        analysis_data=encrypted_blob # Store ENCRYPTED data
+        analysis_blob=encrypted_blob, # Store ENCRYPTED data
+        analysis_key_id=ACTIVE_KEY_ID
     )
     db.add(record)
+    record_margin(db, record.revenue, record.profit)
+    if ledger_state:
+        # Keep per-period aggregates so next month's re-upload can be appended incrementally
+        db.flush()
+        save_ledger_state(db, record.id, ledger_state)
     db.commit()
     db.refresh(record)
 
-    return result
+    # Needed by clients to append next month's ledger to this record
+    result["record_id"] = record.id
+    return ORJSONResponse(result)
+
+@router.post("/{record_id}/append", summary="Append New Periods to an Upload")
+async def append_file(
+    record_id: int,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-upload a ledger that contains all prior periods plus new ones.
+    Only rows after the stored watermark are parsed and folded into the
+    saved per-period totals; the record is updated in place.
+    """
+    record = db.query(FinancialRecord).filter(FinancialRecord.id == record_id, FinancialRecord.user_id == current_user.id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Financial record not found")
+    if not file.filename.lower().endswith(('.csv', '.xlsx')):
+        raise HTTPException(status_code=400, detail="Append mode supports CSV and XLSX files only")
+
+    content = await file.read()
+    result, ledger_state = ingest_ledger(file.filename, content, load_ledger_state(db, record.id), appending=True)
+
+    summary = result.get("financial_summary", {})
+    apply_margin_benchmark(summary, db)
+    # The margin sketch is not updated here: this record's earlier margin is
+    # already counted and a t-digest cannot retract values.
+
+    record.filename = file.filename
+    record.upload_date = datetime.datetime.utcnow()
+    record.revenue = summary.get("revenue", {}).get("total", 0)
+    record.expenses = summary.get("expenses", {}).get("total", 0)
+    record.profit = summary.get("net_profit", 0)
+    record.analysis_blob = seal_analysis(result)
+    record.analysis_key_id = ACTIVE_KEY_ID
+    record.analysis_data = None
+    save_ledger_state(db, record.id, ledger_state)
+    db.commit()
+
+    result["record_id"] = record.id
+    return ORJSONResponse(result)
 
 @router.post("/manual", summary="Analyze Manual Data")
 async def analyze_manual(
@@ -71,9 +120,9 @@ async def analyze_manual(
     
     # Save to DB
     summary = result.get("financial_summary", {})
+    apply_margin_benchmark(summary, db)
     
-    json_data = json.dumps(result)
-    encrypted_blob = encrypt_data(json_data)
+    encrypted_blob = seal_analysis(result)
 
     record = FinancialRecord(
         user_id=current_user.id,
@@ -81,9 +130,11 @@ async def analyze_manual(
         revenue=summary.get("revenue", {}).get("total", 0),
         expenses=summary.get("expenses", {}).get("total", 0),
         profit=summary.get("net_profit", 0),
-        analysis_data=encrypted_blob
+        analysis_blob=encrypted_blob,
+        analysis_key_id=ACTIVE_KEY_ID
     )
     db.add(record)
+    record_margin(db, record.revenue, record.profit)
     db.commit()
     
-    return result
+    return ORJSONResponse(result)
@@ -1,6 +1,13 @@
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import os
 import base64
+import binascii
+import json
+import struct
+import zlib
 
 # Generate a key if not exists (In production, load strictly from env)
 # We handle the case where env might be missing by generating one (but warn in logs)
@@ -30,3 +37,112 @@ def decrypt_data(token: str) -> str:
     except Exception as e:
         print(f"Decryption error: {e}")
         return "{}" # Return empty JSON compatible string on failure
+
+
+# --- Binary analysis envelope (v1) ---
+# Layout: version (1 byte) | key id (2 bytes, big endian) | nonce (12 bytes) | AES-GCM(zlib(json))
+# The version + key id header is authenticated as associated data, so it cannot be swapped.
+ENVELOPE_VERSION = 1
+_HEADER = struct.Struct(">BH")
+_NONCE_SIZE = 12
+
+
+class DecryptionError(Exception):
+    """Raised when a stored analysis blob cannot be decrypted or parsed."""
+
+
+def _derive_default_key(fernet_key: bytes) -> bytes:
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"ledgercheck/analysis-envelope",
+    ).derive(base64.urlsafe_b64decode(fernet_key))
+
+
+def _decode_keyring_key(key_id: int, encoded: str) -> bytes:
+    try:
+        raw = base64.urlsafe_b64decode(encoded)
+    except (binascii.Error, ValueError) as e:
+        raise RuntimeError(f"ENCRYPTION_KEYRING key {key_id} is not valid base64: {e}") from e
+    if len(raw) not in (16, 24, 32):
+        raise RuntimeError(f"ENCRYPTION_KEYRING key {key_id} must decode to 16, 24 or 32 bytes, got {len(raw)}")
+    return raw
+
+
+def _load_keyring(raw: str, fernet_key: bytes):
+    """
+    Build the envelope keyring. Key id 1 is always derived from ENCRYPTION_KEY,
+    so envelopes written before a keyring was configured stay readable;
+    ENCRYPTION_KEYRING ("2:<b64 key>,3:<b64 key>") adds ids or overrides them.
+    """
+    keyring = {1: _derive_default_key(fernet_key)}
+    for entry in (raw or "").split(","):
+        if not entry.strip():
+            continue
+        key_id, _, encoded = entry.strip().partition(":")
+        try:
+            key_id = int(key_id)
+        except ValueError:
+            raise RuntimeError(f"ENCRYPTION_KEYRING entry {entry.strip()!r} must look like <id>:<base64 key>")
+        keyring[key_id] = _decode_keyring_key(key_id, encoded.strip())
+    return keyring
+
+
+KEYRING = _load_keyring(os.getenv("ENCRYPTION_KEYRING"), key)
+ACTIVE_KEY_ID = int(os.getenv("ENCRYPTION_KEY_ID", max(KEYRING)))
+
+if ACTIVE_KEY_ID not in KEYRING:
+    raise RuntimeError(f"ENCRYPTION_KEY_ID {ACTIVE_KEY_ID} is not present in ENCRYPTION_KEYRING")
+
+
+def seal_analysis(data: dict, key_id: int = None) -> bytes:
+    """Compress and encrypt an analysis dict into a binary envelope."""
+    key_id = ACTIVE_KEY_ID if key_id is None else key_id
+    header = _HEADER.pack(ENVELOPE_VERSION, key_id)
+    nonce = os.urandom(_NONCE_SIZE)
+    payload = zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+    return header + nonce + AESGCM(KEYRING[key_id]).encrypt(nonce, payload, header)
+
+
+def open_analysis(blob: bytes) -> dict:
+    """Decrypt a binary envelope back into an analysis dict. Raises DecryptionError."""
+    try:
+        version, key_id = _HEADER.unpack_from(blob)
+        if version != ENVELOPE_VERSION:
+            raise DecryptionError(f"Unsupported envelope version {version}")
+        if key_id not in KEYRING:
+            raise DecryptionError(f"Unknown encryption key id {key_id}")
+        header_size = _HEADER.size
+        nonce = blob[header_size:header_size + _NONCE_SIZE]
+        ciphertext = blob[header_size + _NONCE_SIZE:]
+        payload = AESGCM(KEYRING[key_id]).decrypt(nonce, ciphertext, blob[:header_size])
+        return json.loads(zlib.decompress(payload))
+    except DecryptionError:
+        raise
+    except Exception as e:
+        raise DecryptionError(f"Could not open analysis envelope: {e}") from e
+
+
+def _open_legacy(token: str) -> dict:
+    """Read a pre-envelope analysis_data value (Fernet token, or plain JSON for very old rows)."""
+    try:
+        return json.loads(cipher_suite.decrypt(token.encode()))
+    except Exception:
+        try:
+            return json.loads(token)
+        except Exception as e:
+            raise DecryptionError(f"Could not decrypt legacy analysis data: {e}") from e
+
+
+def load_analysis(record) -> dict:
+    """
+    Read the stored analysis for a FinancialRecord (or a row with the same columns).
+    Prefers the binary envelope and falls back to the legacy string column.
+    Raises DecryptionError instead of silently returning an empty result.
+    """
+    if record.analysis_blob:
+        return open_analysis(record.analysis_blob)
+    if record.analysis_data:
+        return _open_legacy(record.analysis_data)
+    return {}
@@ -1,88 +1,198 @@
 import pandas as pd
+import numpy as np
 import io
-from fastapi import UploadFile, HTTPException
+from services.csv_engine import read_financial_csv, canonicalize_columns, to_label, to_number
+from services.categorizer import label_expenses, DEFAULT_EXPENSE_SPLIT, ITC_ELIGIBLE_CATEGORIES
 
-async def process_financial_document(file: UploadFile):
+REVENUE_TYPES = ['income', 'revenue', 'sales', 'credit', 'cr']
+EXPENSE_TYPES = ['expense', 'cost', 'expenditure', 'debit', 'dr']
+
+# Assumed Intra-State Supply -> 18% GST split into 9% CGST + 9% SGST
+GST_RATE = 0.18
+CGST_RATE = 0.09
+SGST_RATE = 0.09
+
+# Mock revenue history relative to the latest period (until real dated history is extracted)
+MOCK_HISTORY_FACTORS = [0.8, 0.82, 0.85, 0.9, 0.95, 1.0]
+
+# Industry margin used until services.benchmark has enough real records to replace it
+DEFAULT_INDUSTRY_MARGIN = 15.0
+
+# The scoring helpers below work on scalars and on numpy arrays alike, so the
+# what-if simulator (services/scenarios.py) can evaluate whole grids in one pass.
+
+def compute_margin(rev, profit):
+    rev = np.asarray(rev, dtype=float)
+    profit = np.asarray(profit, dtype=float)
+    safe_rev = np.where(rev > 0, rev, 1.0)
+    return np.where(rev > 0, profit / safe_rev * 100, 0.0)
+
+def compute_health_score(margin):
+    # Simple mock logic: margin * 2 + 50
+    return np.clip(np.trunc(np.asarray(margin) * 2 + 50), 0, 100).astype(int)
+
+def compute_risk_level(health_score):
+    health_score = np.asarray(health_score)
+    return np.where(health_score > 70, "Low", np.where(health_score > 40, "Medium", "High"))
+
+def compute_gst(rev, itc_base):
+    """Output tax, input tax credit and net payable (CGST + SGST each floored at zero)."""
+    rev = np.asarray(rev, dtype=float)
+    itc_base = np.asarray(itc_base, dtype=float)
+    output_cgst = rev * CGST_RATE
+    output_sgst = rev * SGST_RATE
+    itc_cgst = itc_base * CGST_RATE
+    itc_sgst = itc_base * SGST_RATE
+    net_payable = np.maximum(0, output_cgst - itc_cgst) + np.maximum(0, output_sgst - itc_sgst)
+    return {
+        "output_total": rev * GST_RATE,
+        "output_cgst": output_cgst,
+        "output_sgst": output_sgst,
+        "itc_total": itc_base * GST_RATE,
+        "itc_cgst": itc_cgst,
+        "itc_sgst": itc_sgst,
+        "net_payable": net_payable,
+    }
+
+def compute_forecast(history):
     """
-    Process uploaded financial document (CSV/Excel) and extract metrics.
-    Currently supports CSV.
+    Exponential-smoothing style projection over the last axis of history.
+    Weights: 50% most recent, 30% previous, 20% before that, plus half the latest trend.
     """
-    filename = file.filename.lower()
-    
-    try:
-        content = await file.read()
-        
-        if filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif filename.endswith('.xlsx'):
-             # Requires openpyxl
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-             # Basic mockup for other files or if parsing fails logic not implemented
-             return {
-                 "status": "partial_success",
-                 "message": "File type not fully supported yet, returning mock analysis",
-                 "summary": mock_analysis_result()
-             }
-        
-        # Data extraction logic
-        total_revenue = 0
-        total_expenses = 0
-        
-        # Normalize columns to lowercase for easier matching
-        df.columns = [c.lower() for c in df.columns]
-        
-        if 'type' in df.columns and 'amount' in df.columns:
-            # Group by type and sum amounts
-            # Expecting type values like 'income', 'revenue' vs 'expense', 'cost'
-            for index, row in df.iterrows():
-                row_type = str(row['type']).lower()
-                amount = pd.to_numeric(row['amount'], errors='coerce')
-                
-                if pd.isna(amount):
-                    continue
-                    
-                if row_type in ['income', 'revenue', 'sales']:
-                    total_revenue += amount
-                elif row_type in ['expense', 'cost', 'expenditure']:
-                    total_expenses += amount
-        
-        
-        # New Logic: Handle "Wide" Format (e.g., Month, Revenue, Expenses)
-        elif 'revenue' in df.columns or 'expenses' in df.columns:
-             if 'revenue' in df.columns:
-                 total_revenue = pd.to_numeric(df['revenue'], errors='coerce').sum()
-             if 'expenses' in df.columns:
-                 total_expenses = pd.to_numeric(df['expenses'], errors='coerce').sum()
-             
-             # Extract history if 'month' exists (for charts)
-             # Note: This updates the mock_analysis_result defaults if passed
-             # For now, we just sum totals.
-
-        # Ensure native Python types for JSON serialization
-        total_revenue = float(total_revenue)
-        total_expenses = float(total_expenses)
-        
-        # Calculate profit
-        net_profit = total_revenue - total_expenses
-        
-        # Prepare overrides for the mock result
-        extracted_data = {
-            "revenue": total_revenue,
-            "expenses": total_expenses,
-            "profit": net_profit
-        }
+    history = np.asarray(history, dtype=float)
+    recent_avg = (history[..., -1] * 0.5) + (history[..., -2] * 0.3) + (history[..., -3] * 0.2)
+    trend = history[..., -1] - history[..., -2]
+    return recent_avg + (trend * 0.5)
+
+def read_ledger(filename: str, content: bytes):
+    """Parse an uploaded ledger into a frame with canonical column names (None if unsupported)."""
+    filename = filename.lower()
+    if filename.endswith('.csv'):
+        df, _layout = read_financial_csv(content)
+        return df
+    if filename.endswith('.xlsx'):
+        # Requires openpyxl
+        df = canonicalize_columns(pd.read_excel(io.BytesIO(content)))
+        df.columns = [str(c).lower() for c in df.columns]
+        return df
+    return None
+
+def extract_amounts(df: pd.DataFrame):
+    """
+    Per-row revenue and expense amounts (0 where a row is neither).
+    Column names are already canonical (see services/csv_engine.COLUMN_SYNONYMS).
+    """
+    zeros = pd.Series(0.0, index=df.index)
+
+    if 'type' in df.columns and 'amount' in df.columns:
+        # Expecting type values like 'income', 'revenue' vs 'expense', 'cost' (or bank 'CR'/'DR')
+        row_type = to_label(df['type'])
+        amount = to_number(df['amount']).fillna(0.0)
+        revenue = amount.where(row_type.isin(REVENUE_TYPES).fillna(False), 0.0)
+        expenses = amount.where(row_type.isin(EXPENSE_TYPES).fillna(False), 0.0)
+
+    # Bank statement format: separate Credit / Debit columns
+    elif 'credit' in df.columns or 'debit' in df.columns:
+        revenue = to_number(df['credit']).fillna(0.0) if 'credit' in df.columns else zeros
+        expenses = to_number(df['debit']).fillna(0.0) if 'debit' in df.columns else zeros
+
+    # "Wide" Format (e.g., Month, Revenue, Expenses)
+    elif 'revenue' in df.columns or 'expenses' in df.columns:
+        revenue = to_number(df['revenue']).fillna(0.0) if 'revenue' in df.columns else zeros
+        expenses = to_number(df['expenses']).fillna(0.0) if 'expenses' in df.columns else zeros
+
+    else:
+        revenue, expenses = zeros, zeros
 
-        return {
-            "status": "success",
-            "filename": file.filename,
-            "rows_processed": len(df),
-            "columns": list(df.columns),
-            "financial_summary": mock_analysis_result(extracted_data)
+    return revenue, expenses
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """
+    Parse a date column. ISO (yyyy-mm-dd) values are read as such; dayfirst
+    would swap their month and day, so it is only applied to the remaining
+    ambiguous Indian-style forms (dd/mm/yyyy, dd-mm-yyyy).
+    """
+    import warnings
+    text = series.astype("string").str.strip()
+    iso = text.str.match(r"^\d{4}-\d{2}-\d{2}").fillna(False).astype(bool)
+    dates = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    if iso.any():
+        parsed = pd.to_datetime(text[iso], format="ISO8601", errors="coerce", utc=True)
+        dates[iso] = parsed.dt.tz_localize(None)
+    if (~iso).any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            dates[~iso] = pd.to_datetime(text[~iso], dayfirst=True, errors="coerce")
+    return dates
+
+def period_keys(df: pd.DataFrame) -> pd.Series:
+    """Reporting period of each row: YYYY-MM from a date column, else the Month column, else one period."""
+    if 'date' in df.columns:
+        dates = parse_dates(df['date'])
+        # Format each distinct month once instead of strftime on every row
+        codes, months = pd.factorize(dates.dt.year * 100 + dates.dt.month)
+        labels = np.array([f"{int(m) // 100:04d}-{int(m) % 100:02d}" for m in months] + ["undated"], dtype=object)
+        return pd.Series(labels[codes], index=df.index) # code -1 (no date) picks "undated"
+    if 'month' in df.columns:
+        return df['month'].astype("string").str.strip().fillna("undated")
+    return pd.Series("all", index=df.index)
+
+def aggregate_ledger(df: pd.DataFrame) -> dict:
+    """
+    Additive per-period totals: {period: {"revenue", "expenses", "breakdown"}}.
+    Periods keep their first-seen order; breakdown is empty when expenses can't be classified.
+    """
+    revenue, expenses = extract_amounts(df)
+    frame = pd.DataFrame({"period": period_keys(df).astype(object), "revenue": revenue, "expenses": expenses})
+
+    periods = {}
+    for period, totals in frame.groupby("period", sort=False)[["revenue", "expenses"]].sum().iterrows():
+        periods[str(period)] = {
+            "revenue": float(totals["revenue"]),
+            "expenses": float(totals["expenses"]),
+            "breakdown": {}
         }
 
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+    labels = label_expenses(df, expenses.index[expenses != 0])
+    if labels is not None:
+        spent = pd.DataFrame({"period": frame["period"][labels.index], "category": labels, "amount": expenses[labels.index]})
+        for (period, category), amount in spent.groupby(["period", "category"], sort=False)["amount"].sum().items():
+            if amount:
+                periods[str(period)]["breakdown"][category] = float(amount)
+
+    return periods
+
+def ordered_periods(periods: dict) -> list:
+    """Chronological when every period is YYYY-MM, otherwise first-seen order."""
+    keys = list(periods)
+    if keys and all(len(k) == 7 and k[4] == "-" for k in keys):
+        return sorted(keys)
+    return keys
+
+def summarize_periods(periods: dict) -> dict:
+    """Turn per-period totals into the overrides mock_analysis_result expects."""
+    total_revenue = float(sum(p["revenue"] for p in periods.values()))
+    total_expenses = float(sum(p["expenses"] for p in periods.values()))
+
+    extracted_data = {
+        "revenue": total_revenue,
+        "expenses": total_expenses,
+        "profit": total_revenue - total_expenses
+    }
+
+    breakdown = {}
+    for p in periods.values():
+        for category, amount in p["breakdown"].items():
+            breakdown[category] = breakdown.get(category, 0.0) + amount
+    if breakdown:
+        extracted_data["expense_breakdown"] = breakdown
+
+    # Real monthly history for the chart and forecast once there is enough of it
+    history = [periods[k]["revenue"] for k in ordered_periods(periods) if k not in ("all", "undated")]
+    if len(history) >= 3:
+        extracted_data["revenue_history"] = history[-len(MOCK_HISTORY_FACTORS):]
+
+    return extracted_data
 
 def analyze_manual_data(data: dict):
     """
@@ -110,29 +220,25 @@ def mock_analysis_result(data_override=None):
     exp = data_override.get('expenses') if data_override else defaults['expenses']
     profit = data_override.get('profit') if data_override else (rev - exp) # Auto calc profit if missing but normally user provides
 
+    # Real category totals when the upload could be classified, else the standard split
+    expense_breakdown = (data_override or {}).get('expense_breakdown') or {
+        category: exp * share for category, share in DEFAULT_EXPENSE_SPLIT.items()
+    }
+
     # Calculate some derived stats
-    margin = (profit / rev * 100) if rev > 0 else 0
-    health_score = min(max(int(margin * 2 + 50), 0), 100) # Simple mock logic: margin * 2 + 50
+    margin = float(compute_margin(rev, profit))
+    health_score = int(compute_health_score(margin))
     
-    risk_level = "Low" if health_score > 70 else "Medium" if health_score > 40 else "High"
+    risk_level = str(compute_risk_level(health_score))
     
-    # Generate Mock History (if real history not available)
-    # In a real app, we would extract this from date columns in CSV
-    history_data = [rev * 0.8, rev * 0.82, rev * 0.85, rev * 0.9, rev * 0.95, rev]
+    # Real per-period history when the upload had dates/months, else a mock history
+    history_data = (data_override or {}).get('revenue_history') or [rev * factor for factor in MOCK_HISTORY_FACTORS]
     
     # forecast logic: Exponential Smoothing (Weighted heavily on recent data)
-    import numpy as np
     try:
         # Simple weighted projection if we have enough data points
         if len(history_data) >= 3:
-            # Weights: 50% most recent, 30% previous, 20% before that
-            recent_avg = (history_data[-1] * 0.5) + (history_data[-2] * 0.3) + (history_data[-3] * 0.2)
-            
-            # Calculate recent trend (last month growth)
-            trend = history_data[-1] - history_data[-2]
-            
-            # Forecast = Recent Weighted Avg + (Trend * 0.5 Conservative Factor)
-            forecast_next = recent_avg + (trend * 0.5)
+            forecast_next = float(compute_forecast(history_data))
         else:
             # Fallback to simple 5% growth if not enough data
             forecast_next = rev * 1.05 
@@ -142,43 +248,31 @@ def mock_analysis_result(data_override=None):
         forecast_next = rev * 1.05 # Conservative Fallback
 
     # Benchmarking Logic
-    industry_avg_margin = 15.0 # Mock Industry Average
+    industry_avg_margin = DEFAULT_INDUSTRY_MARGIN
     benchmark_status = "Above Average" if margin > industry_avg_margin else "Below Average"
 
     
     
     # --- NEW: TAX COMPLIANCE ENGINE (GST Simulation - Fully Implemented) ---
     # 1. Output Tax Liability (Assumed Intra-State Supply -> 18% GST split into 9% CGST + 9% SGST)
-    gst_rate = 0.18
-    cgst_rate = 0.09
-    sgst_rate = 0.09
-    
-    total_output_tax = rev * gst_rate
-    output_cgst = rev * cgst_rate
-    output_sgst = rev * sgst_rate
-    
     # 2. Input Tax Credit (ITC) Estimation
     # Logic: Different categories have different eligibility
     # - Marketing: 100% Eligible
     # - Rent: 100% Eligible (if commercial)
     # - COGS: Assumed 100% Eligible (Raw materials)
-    # - Payroll: 0% Eligible (Exempt)
+    # - Utilities: 100% Eligible (business use)
+    # - Payroll / Other: 0% Eligible (Exempt or unknown)
     
     itc_eligible_expenses = {
-        "COGS": exp * 0.45,
-        "Rent": exp * 0.15,
-        "Marketing": exp * 0.05
+        category: amount for category, amount in expense_breakdown.items()
+        if category in ITC_ELIGIBLE_CATEGORIES
     }
     
     total_eligible_base = sum(itc_eligible_expenses.values())
-    total_itc = total_eligible_base * gst_rate
-    itc_cgst = total_eligible_base * cgst_rate
-    itc_sgst = total_eligible_base * sgst_rate
     
     # 3. Net Payable
-    net_payable_cgst = max(0, output_cgst - itc_cgst)
-    net_payable_sgst = max(0, output_sgst - itc_sgst)
-    net_total_payable = net_payable_cgst + net_payable_sgst
+    gst = {key: float(value) for key, value in compute_gst(rev, total_eligible_base).items()}
+    net_total_payable = gst["net_payable"]
     
     # 4. Compliance Calendar (Dynamic Dates)
     # Logic: GSTR-1 is due on 11th of next month, GSTR-3B on 20th.
@@ -197,15 +291,7 @@ def mock_analysis_result(data_override=None):
     tax_compliance = {
         "status": "Good" if net_total_payable < (rev * 0.1) else "Review Needed",
         "details": {
-            "breakdown": {
-                "output_total": round(total_output_tax, 2),
-                "output_cgst": round(output_cgst, 2),
-                "output_sgst": round(output_sgst, 2),
-                "itc_total": round(total_itc, 2),
-                "itc_cgst": round(itc_cgst, 2),
-                "itc_sgst": round(itc_sgst, 2),
-                "net_payable": round(net_total_payable, 2)
-            },
+            "breakdown": {key: round(value, 2) for key, value in gst.items()},
             "deadlines": {
                 "GSTR-1": due_gstr1,
                 "GSTR-3B": due_gstr3b
@@ -261,7 +347,7 @@ def mock_analysis_result(data_override=None):
 
         # 2. Marketing/Growth Check
         # Always suggest growth advice
-        if (exp * 0.05) < (rev * 0.05):
+        if expense_breakdown.get("Marketing", 0) < (rev * 0.05):
             ai_recommendations.append("REC_INCREASE_MARKETING_ROI")
         else:
             ai_recommendations.append("REC_INCREASE_MARKETING")
@@ -278,12 +364,7 @@ def mock_analysis_result(data_override=None):
         },
         "expenses": {
             "total": exp,
-            "breakdown": {
-                "COGS": exp * 0.45,
-                "Payroll": exp * 0.35,
-                "Rent": exp * 0.15,
-                "Marketing": exp * 0.05
-            }
+            "breakdown": expense_breakdown
         },
         "net_profit": profit,
         "health_score": health_score,
@@ -0,0 +1,214 @@
+import json
+import math
+import os
+import time
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import FinancialRecord, BenchmarkSketch
+
+MARGIN_SKETCH = "profit_margin"
+
+# Below this many records the analyzer's DEFAULT_INDUSTRY_MARGIN is kept
+MIN_BENCHMARK_SAMPLES = int(os.getenv("MIN_BENCHMARK_SAMPLES", "20"))
+
+# How long a worker serves percentiles from its in-memory copy before re-reading the shared sketch
+SKETCH_CACHE_SECONDS = float(os.getenv("SKETCH_CACHE_SECONDS", "60"))
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning & Ertl): a mergeable quantile sketch holding at
+    most ~compression centroids, so cdf/quantile cost does not grow with the
+    number of values added.
+    """
+
+    def __init__(self, compression=100, means=None, weights=None, minimum=math.inf, maximum=-math.inf):
+        self.compression = compression
+        self.means = list(means or [])
+        self.weights = list(weights or [])
+        self.min = minimum
+        self.max = maximum
+        self._buffer = []
+
+    @property
+    def count(self):
+        return sum(self.weights) + sum(w for _, w in self._buffer)
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer.append((float(value), float(weight)))
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        other._compress()
+        self._buffer.extend(zip(other.means, other.weights))
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _scale(self, q):
+        # k1 scale function: small centroids near the tails, large ones in the middle
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in points)
+
+        means, weights = [], []
+        mean, weight = points[0]
+        weight_so_far = 0.0
+        k_left = self._scale(0.0)
+        for m, w in points[1:]:
+            if self._scale((weight_so_far + weight + w) / total) - k_left <= 1:
+                weight += w
+                mean += (m - mean) * w / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                weight_so_far += weight
+                k_left = self._scale(weight_so_far / total)
+                mean, weight = m, w
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def _curve(self):
+        self._compress()
+        weights = np.asarray(self.weights)
+        centers = np.cumsum(weights) - weights / 2
+        xs = np.concatenate(([self.min], self.means, [self.max]))
+        ys = np.concatenate(([0.0], centers, [weights.sum()]))
+        return xs, ys
+
+    def cdf(self, value: float) -> float:
+        """Fraction of values <= value."""
+        if not self.count:
+            return math.nan
+        xs, ys = self._curve()
+        return float(np.interp(value, xs, ys) / ys[-1])
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        xs, ys = self._curve()
+        return float(np.interp(q * ys[-1], ys, xs))
+
+    def to_json(self) -> str:
+        self._compress()
+        return json.dumps({
+            "compression": self.compression,
+            "means": self.means,
+            "weights": self.weights,
+            "min": self.min if self.weights else None,
+            "max": self.max if self.weights else None,
+        })
+
+    @classmethod
+    def from_json(cls, payload: str) -> "TDigest":
+        data = json.loads(payload)
+        return cls(
+            compression=data["compression"],
+            means=data["means"],
+            weights=data["weights"],
+            minimum=math.inf if data["min"] is None else data["min"],
+            maximum=-math.inf if data["max"] is None else data["max"],
+        )
+
+
+def profit_margin(revenue, profit):
+    """Same margin definition the analyzer uses (percent of revenue)."""
+    if not revenue or revenue <= 0 or profit is None:
+        return None
+    return profit / revenue * 100
+
+
+_cache = {"sketch": None, "loaded_at": 0.0}
+
+
+def _build_from_records(db: Session) -> TDigest:
+    """One-off backfill from existing records, streamed in batches."""
+    sketch = TDigest()
+    rows = db.query(FinancialRecord.revenue, FinancialRecord.profit).yield_per(1000)
+    for revenue, profit in rows:
+        margin = profit_margin(revenue, profit)
+        if margin is not None:
+            sketch.add(margin)
+    return sketch
+
+
+def ensure_margin_sketch(db: Session):
+    """Create the shared margin sketch on first start, backfilled from existing records."""
+    if db.get(BenchmarkSketch, MARGIN_SKETCH):
+        return
+    sketch = _build_from_records(db)
+    db.add(BenchmarkSketch(name=MARGIN_SKETCH, data=sketch.to_json(), count=int(sketch.count)))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker created it first
+        db.rollback()
+
+
+def get_margin_sketch(db: Session) -> TDigest:
+    """Return this worker's cached copy of the shared sketch, refreshing it after SKETCH_CACHE_SECONDS."""
+    if _cache["sketch"] is None or time.monotonic() - _cache["loaded_at"] > SKETCH_CACHE_SECONDS:
+        row = db.get(BenchmarkSketch, MARGIN_SKETCH)
+        _cache["sketch"] = TDigest.from_json(row.data) if row else TDigest()
+        _cache["loaded_at"] = time.monotonic()
+    return _cache["sketch"]
+
+
+def record_margin(db: Session, revenue, profit):
+    """
+    Fold a new record's margin into the shared sketch.
+    Runs in the caller's transaction (commit together with the FinancialRecord);
+    the row lock serialises concurrent workers on Postgres.
+    """
+    margin = profit_margin(revenue, profit)
+    if margin is None:
+        return
+
+    row = db.query(BenchmarkSketch).filter(BenchmarkSketch.name == MARGIN_SKETCH).with_for_update().first()
+    if row is None:
+        row = BenchmarkSketch(name=MARGIN_SKETCH, data=TDigest().to_json(), count=0)
+        db.add(row)
+
+    sketch = TDigest.from_json(row.data)
+    sketch.add(margin)
+    row.data = sketch.to_json()
+    row.count = int(sketch.count)
+
+    # Not cached here: the caller may still roll back. Drop this worker's
+    # copy so the next read picks up the committed sketch.
+    _cache["sketch"] = None
+
+
+def apply_margin_benchmark(summary: dict, db: Session):
+    """Replace the static industry average in an analysis with the live distribution."""
+    benchmark = summary.get("benchmark")
+    if not benchmark:
+        return summary
+
+    sketch = get_margin_sketch(db)
+    sample_size = int(sketch.count)
+    if sample_size < MIN_BENCHMARK_SAMPLES:
+        benchmark["sample_size"] = sample_size
+        return summary
+
+    your_margin = benchmark["your_margin"]
+    industry_margin = round(sketch.quantile(0.5), 2)
+    benchmark.update({
+        "industry_margin": industry_margin,
+        "percentile": round(sketch.cdf(your_margin) * 100, 1),
+        "quartiles": [round(sketch.quantile(q), 2) for q in (0.25, 0.5, 0.75)],
+        "sample_size": sample_size,
+        "status": "Above Average" if your_margin > industry_margin else "Below Average",
+    })
+    return summary
@@ -0,0 +1,132 @@
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# Keyword / regex rules per expense category. Categories are tried in order
+# and the first one with a matching rule wins, so more specific ones come first.
+# Override with a JSON file of the same shape via EXPENSE_RULES_PATH.
+DEFAULT_EXPENSE_RULES = {
+    "Payroll": [r"salar(y|ies)", r"wages?", r"payroll", r"stipend", r"bonus", r"\bepf\b", r"\besic?\b", r"provident fund", r"staff welfare"],
+    "Rent": [r"\brent", r"\blease", r"office space", r"premises", r"warehouse charges"],
+    "Marketing": [r"marketing", r"advertis", r"\bads?\b", r"google ads", r"facebook", r"instagram", r"promotion", r"campaign", r"\bseo\b", r"branding"],
+    "Utilities": [r"electricity", r"power bill", r"water bill", r"internet", r"broadband", r"telephone", r"mobile bill", r"\bgas bill"],
+    "COGS": [r"purchase", r"raw material", r"inventory", r"\bstock\b", r"supplier", r"vendor", r"goods", r"freight", r"packaging", r"\bcogs\b", r"manufactur"],
+}
+
+UNCATEGORIZED = "Other"
+
+# Categories whose GST input tax credit can be claimed (Payroll and Other are excluded)
+ITC_ELIGIBLE_CATEGORIES = {"COGS", "Rent", "Marketing", "Utilities"}
+
+# Used when the upload has no description/category column to classify
+DEFAULT_EXPENSE_SPLIT = {
+    "COGS": 0.45,
+    "Payroll": 0.35,
+    "Rent": 0.15,
+    "Marketing": 0.05
+}
+
+
+def load_rules():
+    path = os.getenv("EXPENSE_RULES_PATH")
+    if not path:
+        return DEFAULT_EXPENSE_RULES
+    with open(path) as f:
+        return json.load(f)
+
+
+class ExpenseCategorizer:
+    """
+    Compiles each category's rules into one alternation up front.
+    Distinct descriptions are classified with Arrow's vectorised RE2 kernels,
+    one pass per category in rule order; without pyarrow (or for rules RE2
+    cannot run, e.g. lookarounds) a single combined Python regex is used instead.
+    """
+
+    def __init__(self, rules=None):
+        rules = rules if rules is not None else load_rules()
+        self.categories = [category for category, patterns in rules.items() if patterns]
+        self.category_patterns = {
+            category: "|".join(f"(?:{p})" for p in rules[category])
+            for category in self.categories
+        }
+        # Anchored lookahead per category, tried in rule order: the first
+        # category matching anywhere in the text wins (m.lastgroup tells which)
+        self._groups = {f"c{i}": category for i, category in enumerate(self.categories)}
+        branches = "|".join(
+            f"(?=.*?(?P<{group}>{self.category_patterns[category]}))"
+            for group, category in self._groups.items()
+        )
+        self.pattern = re.compile(f"^(?:{branches})", re.IGNORECASE | re.DOTALL) if branches else None
+
+    def _classify_with_arrow(self, uniques):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        values = pa.array(uniques, type=pa.string())
+        labels = np.full(len(uniques), UNCATEGORIZED, dtype=object)
+        unassigned = np.ones(len(uniques), dtype=bool)
+        for category, pattern in self.category_patterns.items():
+            hits = pc.match_substring_regex(values, pattern, ignore_case=True)
+            hits = hits.fill_null(False).to_numpy(zero_copy_only=False) & unassigned
+            labels[hits] = category
+            unassigned &= ~hits
+        return labels
+
+    def _classify_with_re(self, uniques):
+        match = self.pattern.match
+        return np.array([
+            self._groups[m.lastgroup] if m else UNCATEGORIZED
+            for m in map(match, uniques)
+        ], dtype=object)
+
+    def classify(self, values) -> np.ndarray:
+        """Category for each string in a list of distinct values."""
+        if not len(values) or self.pattern is None:
+            return np.full(len(values), UNCATEGORIZED, dtype=object)
+        try:
+            return self._classify_with_arrow(values)
+        except Exception:
+            return self._classify_with_re(values)
+
+    def categorize(self, text: pd.Series) -> pd.Series:
+        """Return the category for each value of a text column (UNCATEGORIZED when nothing matches)."""
+        # Descriptions repeat a lot, so only classify the distinct values
+        codes, uniques = pd.factorize(text.astype("string"), use_na_sentinel=True)
+        labels = self.classify(list(uniques))
+
+        result = labels[codes] if len(labels) else np.full(len(codes), UNCATEGORIZED, dtype=object)
+        result[codes == -1] = UNCATEGORIZED
+        return pd.Series(pd.Categorical(result), index=text.index)
+
+
+_default_categorizer = None
+
+
+def get_categorizer() -> ExpenseCategorizer:
+    global _default_categorizer
+    if _default_categorizer is None:
+        _default_categorizer = ExpenseCategorizer()
+    return _default_categorizer
+
+
+def label_expenses(df: pd.DataFrame, index):
+    """
+    Category label for the given expense rows.
+    The category column is tried first, then the description for rows it could not place.
+    Returns None when the frame has nothing to classify.
+    """
+    text_columns = [c for c in ("category", "description") if c in df.columns]
+    if not text_columns or not len(index):
+        return None
+
+    categorizer = get_categorizer()
+    labels = categorizer.categorize(df.loc[index, text_columns[0]]).astype(object)
+    for column in text_columns[1:]:
+        unplaced = labels == UNCATEGORIZED
+        if unplaced.any():
+            labels[unplaced] = categorizer.categorize(df.loc[labels.index[unplaced], column]).astype(object)
+    return labels
+
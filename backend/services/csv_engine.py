@@ -0,0 +1,210 @@
+import csv
+import io
+import re
+from dataclasses import dataclass, field
+import pandas as pd
+
+# Real-world header variants (bank statements, Tally/ERP exports) mapped to
+# the canonical column names the analyzer works with.
+COLUMN_SYNONYMS = {
+    "type": ["type", "txn type", "transaction type", "dr cr", "cr dr", "entry type"],
+    "amount": ["amount", "txn amount", "transaction amount", "amt", "value", "amount inr", "amount rs"],
+    "credit": ["credit", "credits", "deposit", "deposits", "credit amount", "deposit amount", "cr amount", "money in"],
+    "debit": ["debit", "debits", "withdrawal", "withdrawals", "debit amount", "withdrawal amount", "dr amount", "money out"],
+    "revenue": ["revenue", "income", "sales", "total revenue", "turnover"],
+    "expenses": ["expenses", "expense", "costs", "expenditure", "total expenses"],
+    "profit": ["profit", "net profit"],
+    "description": ["description", "particulars", "narration", "details", "remarks", "transaction details", "memo"],
+    "category": ["category", "account", "ledger", "head", "expense head", "account head"],
+    "date": ["date", "txn date", "transaction date", "value date", "posting date", "tran date"],
+    "month": ["month", "period"],
+}
+
+NUMERIC_COLUMNS = {"amount", "credit", "debit", "revenue", "expenses", "profit"}
+# Low-cardinality text columns are dictionary-encoded (pandas Categorical)
+CATEGORICAL_COLUMNS = {"type", "category", "month"}
+
+_CANDIDATE_ENCODINGS = ["utf-8-sig", "cp1252", "latin-1"]
+_CANDIDATE_DELIMITERS = ",;\t|"
+_SNIFF_BYTES = 64 * 1024
+
+_SYNONYM_LOOKUP = {
+    synonym: canonical
+    for canonical, synonyms in COLUMN_SYNONYMS.items()
+    for synonym in synonyms
+}
+
+
+@dataclass
+class CsvLayout:
+    """What the header sniffer learned about a CSV before parsing it."""
+    encoding: str
+    delimiter: str
+    header: list
+    column_map: dict = field(default_factory=dict) # original header -> canonical name
+
+    @property
+    def usecols(self):
+        return list(self.column_map)
+
+    @property
+    def dtypes(self):
+        dtypes = {}
+        for original, canonical in self.column_map.items():
+            if canonical in NUMERIC_COLUMNS:
+                dtypes[original] = "float64"
+            elif canonical in CATEGORICAL_COLUMNS:
+                dtypes[original] = "category"
+            else:
+                dtypes[original] = "string"
+        return dtypes
+
+
+def normalize_header(name) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(name).lower()).strip()
+
+
+def match_columns(header) -> dict:
+    """Map each recognised header to its canonical name (first match wins)."""
+    column_map = {}
+    for original in header:
+        canonical = _SYNONYM_LOOKUP.get(normalize_header(original))
+        if canonical and canonical not in column_map.values():
+            column_map[original] = canonical
+    return column_map
+
+
+def canonicalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename recognised columns of an already-loaded frame (e.g. from Excel)."""
+    return df.rename(columns=match_columns(df.columns))
+
+
+def sniff_csv(content: bytes) -> CsvLayout:
+    """Detect encoding, delimiter and column synonyms from the start of the file."""
+    sample_bytes = content[:_SNIFF_BYTES]
+
+    for encoding in _CANDIDATE_ENCODINGS:
+        try:
+            sample = sample_bytes.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            # A multi-byte character may be cut off at the end of the sample
+            try:
+                sample = sample_bytes[:-3].decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+
+    # Only sniff complete lines
+    lines = sample.splitlines()
+    if len(content) > _SNIFF_BYTES and len(lines) > 1:
+        lines = lines[:-1]
+    sample = "\n".join(lines)
+
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=_CANDIDATE_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ","
+
+    header = next(csv.reader(io.StringIO(sample), delimiter=delimiter), [])
+    header = [h.strip() for h in header]
+
+    return CsvLayout(encoding=encoding, delimiter=delimiter, header=header, column_map=match_columns(header))
+
+
+def _read_with_arrow(content: bytes, layout: CsvLayout) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    arrow_types = {
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+    }
+    table = pacsv.read_csv(
+        io.BytesIO(content),
+        read_options=pacsv.ReadOptions(
+            use_threads=True,
+            encoding="utf8" if layout.encoding == "utf-8-sig" else layout.encoding,
+            column_names=layout.header,
+            skip_rows=1,
+        ),
+        parse_options=pacsv.ParseOptions(delimiter=layout.delimiter),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=layout.usecols,
+            column_types={name: arrow_types[dtype] for name, dtype in layout.dtypes.items()},
+        ),
+    )
+    return table.to_pandas()
+
+
+def _unique_names(header) -> list:
+    """Header names with repeats suffixed (.1, .2, ...) the way pandas mangles them."""
+    seen = {}
+    names = []
+    for name in header:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f"{name}.{count}" if count else name)
+    return names
+
+
+def _read_with_pandas(content: bytes, layout: CsvLayout) -> pd.DataFrame:
+    # Amounts may carry thousands separators or currency symbols, so read them
+    # as text here and let the analyzer coerce them.
+    # The sniffed (stripped) header replaces the file's own, as on the Arrow path,
+    # so usecols and the dtype map match "Amount " style headers too.
+    return pd.read_csv(
+        io.BytesIO(content),
+        sep=layout.delimiter,
+        encoding=layout.encoding,
+        header=0,
+        names=_unique_names(layout.header),
+        usecols=layout.usecols or None,
+        dtype={name: "category" if dtype == "category" else "string" for name, dtype in layout.dtypes.items()} or None,
+        skipinitialspace=True,
+    )
+
+
+def read_financial_csv(content: bytes):
+    """
+    Parse a CSV using the sniffed layout.
+    Tries the multithreaded Arrow reader with an explicit dtype map first and
+    falls back to pandas when pyarrow is missing or the file needs lenient parsing.
+    Returns (DataFrame with canonical column names, CsvLayout).
+    """
+    layout = sniff_csv(content)
+
+    df = None
+    if layout.usecols:
+        try:
+            df = _read_with_arrow(content, layout)
+        except Exception as e:
+            print(f"Arrow CSV parse failed, falling back to pandas: {e}")
+
+    if df is None:
+        df = _read_with_pandas(content, layout)
+        if not layout.usecols:
+            # Nothing recognised: keep the old behaviour of lowercase headers
+            df.columns = [str(c).lower() for c in df.columns]
+            return df, layout
+
+    return df.rename(columns=layout.column_map), layout
+
+
+def to_label(series: pd.Series) -> pd.Series:
+    """Strip and lowercase a text column; categoricals only touch their distinct values."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype("string")
+    return series.str.strip().str.lower()
+
+
+def to_number(series: pd.Series) -> pd.Series:
+    """Coerce an amount column to floats, tolerating '1,234.50', '₹ 500' and '(200)'."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+    text = series.astype("string").str.strip()
+    negative = text.str.startswith("(") & text.str.endswith(")")
+    cleaned = text.str.replace(r"[^0-9.\-]", "", regex=True)
+    values = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+    return values.where(~negative.fillna(False), -values)
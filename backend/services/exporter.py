@@ -0,0 +1,151 @@
+import csv
+import io
+import json
+from sqlalchemy import select
+from database import SessionLocal
+from models import FinancialRecord
+from security import load_analysis, DecryptionError
+
+# Rows are pulled from a server-side cursor and decrypted this many at a time,
+# so memory stays flat no matter how long a user's history is.
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Flat columns used for CSV and Parquet (NDJSON also carries the nested blocks)
+EXPORT_COLUMNS = [
+    "id", "date", "filename", "revenue", "expenses", "profit",
+    "health_score", "risk_level", "tax_status", "gst_net_payable"
+]
+
+
+def _iter_record_batches(user_id: int, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Yield lists of export rows for a user, newest first.
+    Uses its own session because the response body is streamed after the
+    request dependencies have been torn down.
+    """
+    stmt = (
+        select(
+            FinancialRecord.id,
+            FinancialRecord.upload_date,
+            FinancialRecord.filename,
+            FinancialRecord.revenue,
+            FinancialRecord.expenses,
+            FinancialRecord.profit,
+            FinancialRecord.analysis_data,
+            FinancialRecord.analysis_blob,
+        )
+        .where(FinancialRecord.user_id == user_id)
+        .order_by(FinancialRecord.upload_date.desc())
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+
+    db = SessionLocal()
+    try:
+        for partition in db.execute(stmt).partitions(batch_size):
+            yield [_to_export_row(r) for r in partition]
+    finally:
+        db.close()
+
+
+def _to_export_row(r):
+    try:
+        analysis = load_analysis(r)
+    except DecryptionError as e:
+        print(f"Export parse error: {e}")
+        analysis = {}
+    summary = analysis.get("financial_summary", analysis)
+    tax = analysis.get("tax_compliance") or summary.get("tax_compliance") or {}
+    breakdown = tax.get("details", {}).get("breakdown", {})
+
+    return {
+        "id": r.id,
+        "date": r.upload_date.strftime("%Y-%m-%d") if r.upload_date else None,
+        "filename": r.filename,
+        "revenue": r.revenue,
+        "expenses": r.expenses,
+        "profit": r.profit,
+        "health_score": summary.get("health_score"),
+        "risk_level": summary.get("risk_level"),
+        "tax_status": tax.get("status"),
+        "gst_net_payable": breakdown.get("net_payable"),
+        "recommendations": summary.get("recommendations", []),
+        "tax_compliance": tax or None,
+    }
+
+
+def stream_csv(user_id: int):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for batch in _iter_record_batches(user_id):
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(user_id: int):
+    for batch in _iter_record_batches(user_id):
+        yield "".join(json.dumps(row) + "\n" for row in batch)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(user_id: int):
+    """Write one Parquet row group per batch and flush it to the client straight away."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.string()),
+        ("filename", pa.string()),
+        ("revenue", pa.float64()),
+        ("expenses", pa.float64()),
+        ("profit", pa.float64()),
+        ("health_score", pa.int64()),
+        ("risk_level", pa.string()),
+        ("tax_status", pa.string()),
+        ("gst_net_payable", pa.float64()),
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _iter_record_batches(user_id):
+            columns = {name: [row[name] for row in batch] for name in EXPORT_COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,174 @@
+import hashlib
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from models import LedgerState
+from security import seal_analysis, open_analysis, DecryptionError, ACTIVE_KEY_ID
+from services.analyzer import (
+    read_ledger, aggregate_ledger, summarize_periods, mock_analysis_result
+)
+
+# Ledger state kept per FinancialRecord so a re-uploaded ledger (all prior
+# months plus a new one) only has its new tail parsed and aggregated:
+#   periods       additive per-period totals (see analyzer.aggregate_ledger)
+#   rows_seen     data rows folded into periods so far
+#   byte_offset   end of the last processed row in the previous upload (CSV only)
+#   header_hash   hash of the header line; a re-shaped export forces a full rebuild
+#   last_row_hash hash of the last processed row, used to find it again if offsets moved
+#   prefix_hash   hash of everything processed so far (line endings normalised);
+#                 the tail is only trusted when the new file starts with exactly that
+
+
+def _hash(line: bytes) -> str:
+    return hashlib.sha256(line.rstrip(b"\r")).hexdigest()
+
+
+def _prefix_hash(content: bytes, end: int) -> str:
+    # CRLF and LF exports of the same rows hash the same
+    return hashlib.sha256(content[:end].replace(b"\r\n", b"\n").rstrip(b"\r")).hexdigest()
+
+
+def _header_end(content: bytes) -> int:
+    end = content.find(b"\n")
+    return len(content) if end == -1 else end
+
+
+def _content_watermark(content: bytes) -> dict:
+    end = len(content)
+    while end and content[end - 1] in b"\r\n":
+        end -= 1
+    header_end = min(_header_end(content), end)
+    last_start = content.rfind(b"\n", 0, end) + 1
+    return {
+        "byte_offset": end,
+        "header_hash": _hash(content[:header_end]),
+        "last_row_hash": _hash(content[last_start:end]) if last_start > 0 else None,
+        "prefix_hash": _prefix_hash(content, end),
+    }
+
+
+def _find_tail(content: bytes, state: dict):
+    """
+    Bytes after the last row processed previously, or None if the new file
+    does not start with exactly the rows already folded in (edited, reordered
+    or re-shaped exports), in which case the caller rebuilds from scratch.
+    Checks the stored byte offset first, then walks back from the end of the
+    file looking for the watermark row when line endings moved the offset.
+    """
+    header_end = _header_end(content)
+    if state.get("header_hash") != _hash(content[:header_end]) or not state.get("prefix_hash"):
+        return None
+
+    offset = state.get("byte_offset") or 0
+    if offset <= len(content) and content[offset:offset + 1] in (b"", b"\n", b"\r"):
+        if _prefix_hash(content, offset) == state["prefix_hash"]:
+            return content[offset:]
+
+    if state.get("last_row_hash") is None:
+        # The previous upload had no data rows, so only the header was processed
+        if _prefix_hash(content, header_end) == state["prefix_hash"]:
+            return content[header_end:]
+        return None
+
+    end = len(content)
+    while end > header_end:
+        start = content.rfind(b"\n", 0, end) + 1
+        if start > header_end and _hash(content[start:end]) == state["last_row_hash"]:
+            if _prefix_hash(content, end) == state["prefix_hash"]:
+                return content[end:]
+        end = start - 1
+    return None
+
+
+def merge_periods(periods: dict, new_periods: dict) -> dict:
+    merged = {period: {**totals, "breakdown": dict(totals["breakdown"])} for period, totals in periods.items()}
+    for period, totals in new_periods.items():
+        target = merged.setdefault(period, {"revenue": 0.0, "expenses": 0.0, "breakdown": {}})
+        target["revenue"] += totals["revenue"]
+        target["expenses"] += totals["expenses"]
+        for category, amount in totals["breakdown"].items():
+            target["breakdown"][category] = target["breakdown"].get(category, 0.0) + amount
+    return merged
+
+
+def ingest_ledger(filename: str, content: bytes, state: dict = None, appending: bool = False):
+    """
+    Analyze an uploaded ledger, incrementally when a previous state is given.
+    Modes: "incremental" (only the new CSV tail is parsed) and "full" (first
+    upload, non-CSV file, or the new file no longer extends the processed rows).
+    With appending=True the result reports which mode was used.
+    Returns (result, new_state); new_state is None for unsupported file types.
+    """
+    try:
+        df = None
+        mode = "full"
+
+        if state:
+            tail = _find_tail(content, state) if filename.lower().endswith(".csv") else None
+            if tail is not None:
+                mode = "incremental"
+                tail = tail.lstrip(b"\r\n")
+                header = content[:_header_end(content)]
+                df = read_ledger(filename, header + b"\n" + tail) if tail.strip() else pd.DataFrame()
+
+        if mode == "full":
+            df = read_ledger(filename, content)
+            if df is None:
+                # Basic mockup for other files or if parsing fails logic not implemented
+                return {
+                    "status": "partial_success",
+                    "message": "File type not fully supported yet, returning mock analysis",
+                    "summary": mock_analysis_result()
+                }, None
+            periods = aggregate_ledger(df)
+            rows_seen = len(df)
+            columns = list(df.columns)
+        else:
+            periods = merge_periods(state["periods"], aggregate_ledger(df))
+            rows_seen = state["rows_seen"] + len(df)
+            columns = state["columns"]
+
+        new_state = {
+            "periods": periods,
+            "rows_seen": rows_seen,
+            "columns": columns,
+        }
+        if filename.lower().endswith(".csv"):
+            new_state.update(_content_watermark(content))
+
+        result = {
+            "status": "success",
+            "filename": filename,
+            "rows_processed": len(df),
+            "columns": columns,
+            "financial_summary": mock_analysis_result(summarize_periods(periods))
+        }
+        if appending:
+            result["append"] = {"mode": mode, "new_rows": len(df), "total_rows": rows_seen}
+        return result, new_state
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+
+
+def load_ledger_state(db: Session, record_id: int):
+    """Stored ledger state for a record, or None (which makes the next append a full rebuild)."""
+    row = db.get(LedgerState, record_id)
+    if not row or not row.state_blob:
+        return None
+    try:
+        return open_analysis(row.state_blob)
+    except DecryptionError as e:
+        print(f"Ledger state error for record {record_id}: {e}")
+        return None
+
+
+def save_ledger_state(db: Session, record_id: int, state: dict):
+    row = db.get(LedgerState, record_id)
+    if row is None:
+        row = LedgerState(record_id=record_id)
+        db.add(row)
+    row.state_blob = seal_analysis(state)
+    row.key_id = ACTIVE_KEY_ID
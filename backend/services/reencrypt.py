@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from sqlalchemy import and_, inspect, or_, text
+from database import SessionLocal, engine
+from models import FinancialRecord, LedgerState
+from security import load_analysis, open_analysis, seal_analysis, DecryptionError, ACTIVE_KEY_ID
+
+# Small chunks keep each transaction short, so the migrator never holds
+# more than a handful of row locks and never locks the table.
+REENCRYPT_BATCH_SIZE = int(os.getenv("REENCRYPT_BATCH_SIZE", "200"))
+REENCRYPT_PAUSE_SECONDS = float(os.getenv("REENCRYPT_PAUSE_SECONDS", "0.05"))
+
+
+def ensure_envelope_columns(bind=engine):
+    """
+    Add the binary envelope / key id columns to existing tables.
+    create_all() only creates missing tables, so older databases need this.
+    """
+    envelope_columns = (
+        (FinancialRecord.__table__, ("analysis_blob", "analysis_key_id")),
+        (LedgerState.__table__, ("key_id",)),
+    )
+    for table, names in envelope_columns:
+        existing = {c["name"] for c in inspect(bind).get_columns(table.name)}
+
+        with bind.begin() as conn:
+            for name in names:
+                if name not in existing:
+                    column = table.c[name]
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+        for index in table.indexes:
+            if any(column.name in names for column in index.columns):
+                index.create(bind=bind, checkfirst=True)
+
+
+def _needs_reencryption():
+    legacy = and_(
+        FinancialRecord.analysis_blob.is_(None),
+        FinancialRecord.analysis_data.isnot(None),
+        FinancialRecord.analysis_data != "",
+    )
+    rotated = and_(
+        FinancialRecord.analysis_blob.isnot(None),
+        or_(FinancialRecord.analysis_key_id.is_(None), FinancialRecord.analysis_key_id != ACTIVE_KEY_ID),
+    )
+    return or_(legacy, rotated)
+
+
+def _ledger_state_needs_reseal():
+    return and_(
+        LedgerState.state_blob.isnot(None),
+        or_(LedgerState.key_id.is_(None), LedgerState.key_id != ACTIVE_KEY_ID),
+    )
+
+
+def _reencrypt_record(record: FinancialRecord):
+    analysis = load_analysis(record)
+    record.analysis_blob = seal_analysis(analysis)
+    record.analysis_key_id = ACTIVE_KEY_ID
+    record.analysis_data = None
+
+
+def _reseal_ledger_state(row: LedgerState):
+    row.state_blob = seal_analysis(open_analysis(row.state_blob))
+    row.key_id = ACTIVE_KEY_ID
+
+
+# (model, primary key, rows still to migrate, migrate one row)
+_REENCRYPT_TARGETS = (
+    (FinancialRecord, FinancialRecord.id, _needs_reencryption, _reencrypt_record),
+    (LedgerState, LedgerState.record_id, _ledger_state_needs_reseal, _reseal_ledger_state),
+)
+
+
+def _reencrypt_pass(target, batch_size: int, pause: float, failed_ids: set) -> int:
+    """One walk over a table by primary key; returns how many rows were migrated."""
+    model, key, needs_migration, migrate = target
+    last_id = 0
+    migrated = 0
+
+    while True:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(model)
+                .filter(key > last_id, needs_migration())
+                .order_by(key)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not rows:
+                break
+
+            for row in rows:
+                row_id = getattr(row, key.key)
+                if row_id in failed_ids:
+                    continue
+                try:
+                    migrate(row)
+                except DecryptionError as e:
+                    # Leave the row untouched so it can be recovered with the right key
+                    print(f"Re-encryption skipped {model.__tablename__} {row_id}: {e}")
+                    failed_ids.add(row_id)
+                    continue
+                migrated += 1
+
+            last_id = getattr(rows[-1], key.key)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        if pause:
+            time.sleep(pause)
+
+    return migrated
+
+
+def reencrypt_records(batch_size: int = REENCRYPT_BATCH_SIZE, pause: float = REENCRYPT_PAUSE_SECONDS):
+    """
+    Move legacy Fernet rows into the binary envelope, and re-seal analyses and
+    ledger states written with a retired key. Walks each table by primary key
+    in chunks and commits after each one. Rows another worker has locked are
+    skipped, so a table is walked again until a pass migrates nothing.
+    Returns (migrated, failed) counts over both tables.
+    """
+    migrated = 0
+    failed = 0
+
+    for target in _REENCRYPT_TARGETS:
+        failed_ids = set()
+        while True:
+            migrated_this_pass = _reencrypt_pass(target, batch_size, pause, failed_ids)
+            migrated += migrated_this_pass
+            if not migrated_this_pass:
+                break
+        failed += len(failed_ids)
+
+    return migrated, failed
+
+
+def start_background_reencryption():
+    """Run the migrator in a daemon thread so startup is not delayed."""
+    def _run():
+        try:
+            migrated, failed = reencrypt_records()
+            if migrated or failed:
+                print(f"Re-encryption finished: {migrated} migrated, {failed} failed")
+        except Exception as e:
+            print(f"Re-encryption error: {e}")
+
+    thread = threading.Thread(target=_run, name="reencrypt-analysis", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    ensure_envelope_columns()
+    migrated, failed = reencrypt_records()
+    print(f"Re-encryption finished: {migrated} migrated, {failed} failed")
@@ -0,0 +1,129 @@
+import math
+import numpy as np
+from services.analyzer import (
+    compute_margin, compute_health_score, compute_risk_level,
+    compute_gst, compute_forecast, MOCK_HISTORY_FACTORS
+)
+from services.categorizer import DEFAULT_EXPENSE_SPLIT, ITC_ELIGIBLE_CATEGORIES, UNCATEGORIZED
+
+MAX_SCENARIOS = 20000
+# Caps on user-supplied keys, checked before any arrays are built
+MAX_BREAKDOWN_CATEGORIES = 50
+MAX_DRIVERS = 16
+
+# Drivers every scenario grid can adjust besides the individual expense categories
+GLOBAL_DRIVERS = ("revenue", "expenses")
+
+
+class ScenarioError(ValueError):
+    """Raised for a scenario grid that cannot be evaluated (unknown driver, too many drivers or combinations)."""
+
+
+def base_breakdown(expenses: float, breakdown=None) -> dict:
+    """
+    Expense categories for the base case; any unexplained remainder goes to Other.
+    Raises ScenarioError when the categories add up to more than expenses.
+    """
+    if not breakdown:
+        return {category: expenses * share for category, share in DEFAULT_EXPENSE_SPLIT.items()}
+    breakdown = dict(breakdown)
+    categorized = sum(breakdown.values())
+    if categorized > expenses and not math.isclose(categorized, expenses):
+        raise ScenarioError(f"Expense breakdown adds up to {categorized:g}, more than total expenses of {expenses:g}")
+    remainder = expenses - categorized
+    if remainder > 0:
+        breakdown[UNCATEGORIZED] = breakdown.get(UNCATEGORIZED, 0) + remainder
+    return breakdown
+
+
+def simulate_scenarios(revenue: float, expenses: float, grid: dict, profit: float = None, breakdown: dict = None,
+                       revenue_history: list = None):
+    """
+    Evaluate every combination of percentage adjustments in grid, e.g.
+    {"revenue": [-10, 0], "Rent": [0, 20]}, against the base figures.
+    All scoring, GST and forecast formulas run once over arrays of length
+    len(product of grid values); nothing is persisted.
+    revenue_history (as stored with the analysis) is scaled with revenue for
+    the forecast; without it the analyzer's mock history is used.
+    """
+    if breakdown and len(breakdown) > MAX_BREAKDOWN_CATEGORIES:
+        raise ScenarioError(f"Expense breakdown has {len(breakdown)} categories (max {MAX_BREAKDOWN_CATEGORIES})")
+    if len(grid) > MAX_DRIVERS:
+        raise ScenarioError(f"Scenario grid has {len(grid)} drivers (max {MAX_DRIVERS})")
+
+    categories = base_breakdown(expenses, breakdown)
+    unknown = [d for d in grid if d not in GLOBAL_DRIVERS and d not in categories]
+    if unknown:
+        raise ScenarioError(f"Unknown adjustment driver(s): {', '.join(unknown)}")
+
+    drivers = list(grid)
+    steps = [np.asarray(grid[d], dtype=float) for d in drivers]
+    # Python ints, so a large grid cannot wrap around and slip under the cap
+    total = math.prod(len(s) for s in steps)
+    if total > MAX_SCENARIOS:
+        raise ScenarioError(f"Scenario grid has {total} combinations (max {MAX_SCENARIOS})")
+
+    # One row per combination, one column per driver (percent change)
+    if steps:
+        mesh = np.meshgrid(*steps, indexing="ij")
+        changes = np.stack([m.ravel() for m in mesh], axis=1)
+    else:
+        changes = np.zeros((1, 0))
+    multiplier = {d: 1 + changes[:, i] / 100 for i, d in enumerate(drivers)}
+    ones = np.ones(total)
+
+    rev = revenue * multiplier.get("revenue", ones)
+    expense_scale = multiplier.get("expenses", ones)
+    category_names = list(categories)
+    category_amounts = np.stack([
+        categories[c] * expense_scale * multiplier.get(c, ones) for c in category_names
+    ], axis=1)
+    exp = category_amounts.sum(axis=1)
+
+    # Keep any difference between the reported profit and revenue - expenses (e.g. other income)
+    other_income = 0.0 if profit is None else profit - (revenue - expenses)
+    net_profit = rev - exp + other_income
+
+    margin = compute_margin(rev, net_profit)
+    health_score = compute_health_score(margin)
+    risk_level = compute_risk_level(health_score)
+
+    eligible = [i for i, c in enumerate(category_names) if c in ITC_ELIGIBLE_CATEGORIES]
+    itc_base = category_amounts[:, eligible].sum(axis=1)
+    net_payable = compute_gst(rev, itc_base)["net_payable"]
+
+    # Same forecast rules as analyzer.mock_analysis_result, per scenario
+    if revenue_history:
+        history = np.asarray(revenue_history[-len(MOCK_HISTORY_FACTORS):], dtype=float)
+        if len(history) >= 3:
+            forecast = compute_forecast(history[None, :] * multiplier.get("revenue", ones)[:, None])
+        else:
+            forecast = rev * 1.05
+    else:
+        forecast = compute_forecast(rev[:, None] * np.asarray(MOCK_HISTORY_FACTORS))
+
+    columns = zip(
+        changes.tolist(),
+        rev.round(2).tolist(),
+        exp.round(2).tolist(),
+        net_profit.round(2).tolist(),
+        margin.round(2).tolist(),
+        health_score.tolist(),
+        risk_level.tolist(),
+        net_payable.round(2).tolist(),
+        forecast.round(2).tolist(),
+    )
+    return [
+        {
+            "adjustments": dict(zip(drivers, change)),
+            "revenue": r,
+            "expenses": e,
+            "net_profit": p,
+            "margin": m,
+            "health_score": h,
+            "risk_level": risk,
+            "gst_net_payable": gst,
+            "forecast": f,
+        }
+        for change, r, e, p, m, h, risk, gst, f in columns
+    ]
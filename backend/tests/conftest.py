@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+import pytest
+from cryptography.fernet import Fernet
+
+# The app imports its modules relative to backend/ (as uvicorn runs it from there)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables, dropped again after the test."""
+    from database import Base, SessionLocal, engine
+    import models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
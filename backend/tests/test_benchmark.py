@@ -0,0 +1,17 @@
+from services import benchmark
+from services.benchmark import ensure_margin_sketch, get_margin_sketch, record_margin
+
+
+def test_rolled_back_margin_is_not_served(db, monkeypatch):
+    monkeypatch.setitem(benchmark._cache, "sketch", None)
+    ensure_margin_sketch(db)
+    assert get_margin_sketch(db).count == 0
+
+    record_margin(db, 1000.0, 200.0)
+    db.rollback()
+    assert get_margin_sketch(db).count == 0
+
+    record_margin(db, 1000.0, 200.0)
+    db.commit()
+    assert get_margin_sketch(db).count == 1
+    assert get_margin_sketch(db).quantile(0.5) == 20.0
@@ -0,0 +1,59 @@
+import pytest
+from services.csv_engine import sniff_csv, read_financial_csv, _read_with_pandas
+from services.ledger import ingest_ledger
+
+
+def totals(content: bytes):
+    result, _state = ingest_ledger("ledger.csv", content)
+    summary = result["financial_summary"]
+    return summary["revenue"]["total"], summary["expenses"]["total"]
+
+
+@pytest.mark.parametrize("delimiter", [",", ";", "\t", "|"])
+def test_sniffs_delimiter(delimiter):
+    content = delimiter.join(["Date", "Narration", "Dr Cr", "Txn Amount"]).encode() + b"\n"
+    content += delimiter.join(["05/01/2024", "Consulting", "Credit", "1000"]).encode() + b"\n"
+    layout = sniff_csv(content)
+    assert layout.delimiter == delimiter
+    assert layout.column_map == {"Date": "date", "Narration": "description", "Dr Cr": "type", "Txn Amount": "amount"}
+
+
+def test_sniffs_cp1252():
+    content = "Date,Particulars,Type,Amount\n05/01/2024,Café supplies €,Debit,250\n".encode("cp1252")
+    layout = sniff_csv(content)
+    assert layout.encoding == "cp1252"
+    df, _layout = read_financial_csv(content)
+    assert df["description"].iloc[0] == "Café supplies €"
+
+
+def test_credit_debit_columns():
+    content = (
+        b"Txn Date,Narration,Deposits,Withdrawals\n"
+        b"05/01/2024,Consulting,1000,\n"
+        b"06/01/2024,Office rent,,300\n"
+    )
+    df, layout = read_financial_csv(content)
+    assert set(layout.column_map.values()) == {"date", "description", "credit", "debit"}
+    assert totals(content) == (1000.0, 300.0)
+
+
+def test_thousands_separators_fall_back_to_pandas():
+    content = (
+        b"Date,Particulars,Type,Amount\n"
+        b'05/01/2024,Consulting,Credit,"1,000.50"\n'
+        b"06/01/2024,Office rent,Debit,\xe2\x82\xb9 200\n"
+        b"07/01/2024,Refund,Debit,(50)\n"
+    )
+    assert totals(content) == (1000.5, 150.0)
+
+
+def test_padded_header_with_pandas_fallback():
+    content = (
+        b"Date ,Particulars ,Type ,Amount \n"
+        b'05/01/2024,Consulting,Credit,"1,000.50"\n'
+        b"06/01/2024,Office rent,Debit,200\n"
+    )
+    layout = sniff_csv(content)
+    df = _read_with_pandas(content, layout).rename(columns=layout.column_map)
+    assert list(df.columns) == ["date", "description", "type", "amount"]
+    assert totals(content) == (1000.5, 200.0)
@@ -0,0 +1,113 @@
+from services.ledger import ingest_ledger
+
+HEADER = b"Date,Particulars,Type,Amount\n"
+
+
+def summary(content: bytes, filename: str = "ledger.csv") -> dict:
+    result, _state = ingest_ledger(filename, content)
+    return result["financial_summary"]
+
+
+def test_iso_dates_keep_month_order():
+    content = HEADER + (
+        b"2024-01-05,Consulting,Credit,1000\n"
+        b"2024-01-13,Office rent,Debit,200\n"
+        b"2024-02-10,Consulting,Credit,1500\n"
+        b"2024-03-20,Consulting,Credit,1800\n"
+    )
+    result = summary(content)
+    assert result["revenue"]["history"] == [1000.0, 1500.0, 1800.0]
+    assert result["expenses"]["total"] == 200.0
+    assert result["revenue"]["forecast"] > 0
+
+
+def test_day_first_dates_match_iso_dates():
+    iso = HEADER + (
+        b"2024-01-05,Consulting,Credit,1000\n"
+        b"2024-02-13,Consulting,Credit,1500\n"
+        b"2024-03-01,Consulting,Credit,1800\n"
+    )
+    day_first = HEADER + (
+        b"05/01/2024,Consulting,Credit,1000\n"
+        b"13/02/2024,Consulting,Credit,1500\n"
+        b"01/03/2024,Consulting,Credit,1800\n"
+    )
+    assert summary(day_first)["revenue"]["history"] == [1000.0, 1500.0, 1800.0]
+    assert summary(day_first) == summary(iso)
+
+
+BASE = HEADER + (
+    b"05/01/2024,Consulting,Credit,1000\n"
+    b"20/01/2024,Office rent,Debit,200\n"
+    b"10/02/2024,Consulting,Credit,1500\n"
+)
+NEW_ROWS = (
+    b"10/02/2024,Google ads,Debit,300\n"
+    b"15/03/2024,Consulting,Credit,1800\n"
+)
+
+
+def append(base: bytes, new: bytes):
+    """Ingest base, then new against its state; return (append result, full re-ingest of new)."""
+    _result, state = ingest_ledger("ledger.csv", base)
+    appended, _state = ingest_ledger("ledger.csv", new, state, appending=True)
+    full, _state = ingest_ledger("ledger.csv", new)
+    return appended, full
+
+
+def test_append_matches_full_ingest():
+    appended, full = append(BASE, BASE + NEW_ROWS)
+    assert appended["append"] == {"mode": "incremental", "new_rows": 2, "total_rows": 5}
+    assert appended["financial_summary"] == full["financial_summary"]
+
+
+def test_append_without_trailing_newline():
+    appended, full = append(BASE.rstrip(b"\n"), BASE + NEW_ROWS.rstrip(b"\n"))
+    assert appended["append"]["mode"] == "incremental"
+    assert appended["append"]["new_rows"] == 2
+    assert appended["financial_summary"] == full["financial_summary"]
+
+
+def test_append_after_line_endings_change():
+    new = (BASE + NEW_ROWS).replace(b"\n", b"\r\n")
+    appended, full = append(BASE, new)
+    assert appended["append"]["mode"] == "incremental"
+    assert appended["append"]["new_rows"] == 2
+    assert appended["financial_summary"] == full["financial_summary"]
+
+
+def test_append_same_file():
+    appended, full = append(BASE, BASE)
+    assert appended["append"] == {"mode": "incremental", "new_rows": 0, "total_rows": 3}
+    assert appended["financial_summary"] == full["financial_summary"]
+
+
+def test_append_reordered_rows_rebuilds():
+    header, *rows = (BASE + NEW_ROWS).splitlines(keepends=True)
+    new = header + b"".join(reversed(rows))
+    appended, full = append(BASE, new)
+    assert appended["append"] == {"mode": "full", "new_rows": 5, "total_rows": 5}
+    assert appended["financial_summary"] == full["financial_summary"]
+
+
+def test_append_edited_row_rebuilds():
+    new = BASE.replace(b"Credit,1000", b"Credit,1200") + NEW_ROWS
+    appended, full = append(BASE, new)
+    assert appended["append"]["mode"] == "full"
+    assert appended["financial_summary"] == full["financial_summary"]
+
+
+def test_append_iso_dated_ledger():
+    base = HEADER + (
+        b"2024-01-05,Consulting,Credit,1000\n"
+        b"2024-01-20,Office rent,Debit,200\n"
+        b"2024-02-10,Consulting,Credit,1500\n"
+    )
+    new = base + (
+        b"2024-02-10,Google ads,Debit,300\n"
+        b"2024-03-15,Consulting,Credit,1800\n"
+    )
+    appended, full = append(base, new)
+    assert appended["append"]["mode"] == "incremental"
+    assert appended["financial_summary"] == full["financial_summary"]
+    assert appended["financial_summary"]["revenue"]["history"] == [1000.0, 1500.0, 1800.0]
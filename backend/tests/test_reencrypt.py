@@ -0,0 +1,84 @@
+import json
+import os
+from sqlalchemy import create_engine, inspect, text
+import security
+from models import FinancialRecord, LedgerState
+from security import seal_analysis, load_analysis, encrypt_data, ACTIVE_KEY_ID
+from services.ledger import load_ledger_state
+from services.reencrypt import ensure_envelope_columns, reencrypt_records
+
+
+def add_record(db, **columns):
+    record = FinancialRecord(user_id=1, filename="ledger.csv", revenue=1000.0, expenses=600.0, profit=400.0, **columns)
+    db.add(record)
+    db.commit()
+    return record.id
+
+
+def test_reencrypt_migrates_legacy_and_retired_key_rows(db, monkeypatch):
+    monkeypatch.setitem(security.KEYRING, 2, os.urandom(32))
+    legacy = add_record(db, analysis_data=encrypt_data(json.dumps({"revenue": 1})))
+    retired = add_record(db, analysis_blob=seal_analysis({"revenue": 2}, key_id=2), analysis_key_id=2)
+    current = add_record(db, analysis_blob=seal_analysis({"revenue": 3}), analysis_key_id=ACTIVE_KEY_ID)
+    current_blob = db.get(FinancialRecord, current).analysis_blob
+
+    assert reencrypt_records(batch_size=1, pause=0) == (2, 0)
+
+    db.expire_all()
+    for record_id, revenue in ((legacy, 1), (retired, 2), (current, 3)):
+        record = db.get(FinancialRecord, record_id)
+        assert record.analysis_key_id == ACTIVE_KEY_ID
+        assert record.analysis_data is None
+        assert load_analysis(record) == {"revenue": revenue}
+    assert db.get(FinancialRecord, current).analysis_blob == current_blob
+
+    # Nothing left to do on a second run
+    assert reencrypt_records(pause=0) == (0, 0)
+
+
+def test_reencrypt_leaves_unreadable_rows_untouched(db, monkeypatch):
+    monkeypatch.setitem(security.KEYRING, 2, os.urandom(32))
+    sealed = seal_analysis({"revenue": 2}, key_id=2)
+    unreadable = add_record(db, analysis_blob=sealed, analysis_key_id=2)
+    readable = add_record(db, analysis_data=encrypt_data(json.dumps({"revenue": 1})))
+    monkeypatch.delitem(security.KEYRING, 2)
+
+    assert reencrypt_records(batch_size=1, pause=0) == (1, 1)
+
+    db.expire_all()
+    assert db.get(FinancialRecord, unreadable).analysis_blob == sealed
+    assert db.get(FinancialRecord, unreadable).analysis_key_id == 2
+    assert load_analysis(db.get(FinancialRecord, readable)) == {"revenue": 1}
+
+
+def test_reencrypt_reseals_ledger_states(db, monkeypatch):
+    monkeypatch.setitem(security.KEYRING, 2, os.urandom(32))
+    record_id = add_record(db, analysis_blob=seal_analysis({"revenue": 1}), analysis_key_id=ACTIVE_KEY_ID)
+    other_id = add_record(db, analysis_blob=seal_analysis({"revenue": 2}), analysis_key_id=ACTIVE_KEY_ID)
+    state = {"periods": {}, "rows_seen": 0}
+    db.add(LedgerState(record_id=record_id, state_blob=seal_analysis(state, key_id=2), key_id=2))
+    # States saved before key ids were tracked
+    db.add(LedgerState(record_id=other_id, state_blob=seal_analysis(state)))
+    db.commit()
+
+    assert reencrypt_records(pause=0) == (2, 0)
+
+    monkeypatch.delitem(security.KEYRING, 2)
+    db.expire_all()
+    for rid in (record_id, other_id):
+        assert db.get(LedgerState, rid).key_id == ACTIVE_KEY_ID
+        assert load_ledger_state(db, rid) == state
+
+
+def test_ensure_envelope_columns_upgrades_old_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE financial_records (id INTEGER PRIMARY KEY, user_id INTEGER, analysis_data VARCHAR)"))
+        conn.execute(text("CREATE TABLE ledger_states (record_id INTEGER PRIMARY KEY, state_blob BLOB)"))
+
+    ensure_envelope_columns(engine)
+    ensure_envelope_columns(engine)  # idempotent
+
+    columns = {table: {c["name"] for c in inspect(engine).get_columns(table)} for table in ("financial_records", "ledger_states")}
+    assert {"analysis_blob", "analysis_key_id"} <= columns["financial_records"]
+    assert "key_id" in columns["ledger_states"]
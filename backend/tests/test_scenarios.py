@@ -0,0 +1,57 @@
+import pytest
+from services.scenarios import simulate_scenarios, ScenarioError, MAX_SCENARIOS
+from services.ledger import ingest_ledger
+
+
+def test_grid_evaluates_every_combination():
+    results = simulate_scenarios(1000.0, 600.0, {"revenue": [-10, 0, 10], "Rent": [0, 20]}, breakdown={"Rent": 100.0})
+    assert len(results) == 6
+    base = next(r for r in results if r["adjustments"] == {"revenue": 0.0, "Rent": 0.0})
+    assert base["revenue"] == 1000.0
+    assert base["expenses"] == 600.0
+
+
+def test_oversized_grid_is_rejected():
+    grid = {"revenue": list(range(200)), "expenses": list(range(200))}
+    with pytest.raises(ScenarioError, match=str(MAX_SCENARIOS)):
+        simulate_scenarios(1000.0, 600.0, grid)
+
+
+def test_grid_size_does_not_overflow():
+    # 16 ** 16 == 2 ** 64 wraps to 0 in int64
+    categories = [f"c{i}" for i in range(16)]
+    grid = {c: list(range(16)) for c in categories}
+    with pytest.raises(ScenarioError, match=f"max {MAX_SCENARIOS}"):
+        simulate_scenarios(1000.0, 600.0, grid, breakdown={c: 1.0 for c in categories})
+
+
+def test_too_many_breakdown_categories():
+    breakdown = {f"c{i}": 1.0 for i in range(1000)}
+    with pytest.raises(ScenarioError):
+        simulate_scenarios(1000.0, 600.0, {"revenue": [0]}, breakdown=breakdown)
+
+
+def test_breakdown_larger_than_expenses_is_rejected():
+    with pytest.raises(ScenarioError, match="more than total expenses"):
+        simulate_scenarios(1000.0, 600.0, {"Rent": [0]}, breakdown={"Rent": 900.0})
+
+
+def test_forecast_matches_stored_analysis():
+    content = (
+        b"Date,Particulars,Type,Amount\n"
+        b"2024-01-05,Consulting,Credit,1000\n"
+        b"2024-02-10,Consulting,Credit,1500\n"
+        b"2024-03-15,Consulting,Credit,1800\n"
+        b"2024-03-20,Office rent,Debit,700\n"
+    )
+    summary = ingest_ledger("ledger.csv", content)[0]["financial_summary"]
+    results = simulate_scenarios(
+        summary["revenue"]["total"],
+        summary["expenses"]["total"],
+        {"revenue": [0, 10]},
+        profit=summary["net_profit"],
+        breakdown=summary["expenses"]["breakdown"],
+        revenue_history=summary["revenue"]["history"],
+    )
+    assert results[0]["forecast"] == round(summary["revenue"]["forecast"], 2)
+    assert results[1]["forecast"] == pytest.approx(results[0]["forecast"] * 1.1, abs=0.01)
@@ -0,0 +1,68 @@
+import base64
+import json
+import os
+from types import SimpleNamespace
+import pytest
+import security
+from security import seal_analysis, open_analysis, load_analysis, encrypt_data, DecryptionError
+
+
+def test_keyring_keeps_default_key_when_configured(monkeypatch):
+    # Envelopes written before a keyring existed must stay readable after rotation
+    blob = seal_analysis({"revenue": 1000}, key_id=1)
+    new_key = base64.urlsafe_b64encode(os.urandom(32)).decode()
+    keyring = security._load_keyring(f"2:{new_key}", security.key)
+    assert sorted(keyring) == [1, 2]
+
+    monkeypatch.setattr(security, "KEYRING", keyring)
+    assert open_analysis(blob) == {"revenue": 1000}
+    assert open_analysis(seal_analysis({"revenue": 5}, key_id=2)) == {"revenue": 5}
+
+
+@pytest.mark.parametrize("raw", ["1:abc", "2:QUJD", "two:QUJD"])
+def test_keyring_rejects_bad_entries(raw):
+    with pytest.raises(RuntimeError, match="ENCRYPTION_KEYRING"):
+        security._load_keyring(raw, security.key)
+
+
+def test_envelope_round_trip():
+    analysis = {"financial_summary": {"revenue": {"total": 1250000.0}}, "recommendations": ["REC_CASH_FLOW_BUFFER"]}
+    blob = seal_analysis(analysis)
+    assert blob[0] == security.ENVELOPE_VERSION
+    assert open_analysis(blob) == analysis
+
+
+def test_unknown_key_id_is_rejected(monkeypatch):
+    monkeypatch.setitem(security.KEYRING, 7, os.urandom(32))
+    blob = seal_analysis({"revenue": 1}, key_id=7)
+    monkeypatch.delitem(security.KEYRING, 7)
+    with pytest.raises(DecryptionError, match="Unknown encryption key id 7"):
+        open_analysis(blob)
+
+
+def test_tampered_envelope_is_rejected(monkeypatch):
+    blob = bytearray(seal_analysis({"revenue": 1}))
+    blob[-1] ^= 0x01
+    with pytest.raises(DecryptionError):
+        open_analysis(bytes(blob))
+
+    # The header is authenticated too, so a blob cannot be relabelled with another key id
+    monkeypatch.setitem(security.KEYRING, 2, security.KEYRING[1])
+    relabelled = bytearray(seal_analysis({"revenue": 1}, key_id=1))
+    relabelled[1:3] = (2).to_bytes(2, "big")
+    with pytest.raises(DecryptionError):
+        open_analysis(bytes(relabelled))
+
+
+def test_load_analysis_prefers_envelope_and_falls_back_to_legacy():
+    analysis = {"revenue": 1000}
+    assert load_analysis(SimpleNamespace(analysis_blob=seal_analysis(analysis), analysis_data="garbage")) == analysis
+    assert load_analysis(SimpleNamespace(analysis_blob=None, analysis_data=encrypt_data(json.dumps(analysis)))) == analysis
+    # Very old rows stored plain JSON
+    assert load_analysis(SimpleNamespace(analysis_blob=None, analysis_data=json.dumps(analysis))) == analysis
+    assert load_analysis(SimpleNamespace(analysis_blob=None, analysis_data=None)) == {}
+
+
+def test_load_analysis_raises_on_unreadable_legacy_data():
+    with pytest.raises(DecryptionError):
+        load_analysis(SimpleNamespace(analysis_blob=None, analysis_data="not a token"))